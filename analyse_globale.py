@@ -1,13 +1,121 @@
 """
 Script d'analyse globale des drawdowns NQ
 Regroupe tous les rapports du dossier Rapports et génère des statistiques globales
+
+Utilisation :
+    python analyse_globale.py                       (analyse du dossier Rapports)
+    python analyse_globale.py analyze [--reports-dir DOSSIER] [--top N]
+    python analyse_globale.py validate [FICHIER ...]
+
+pandas n'est importé que pour l'analyse : `--help` et `validate` répondent sans le charger.
 """
 
-import pandas as pd
-import numpy as np
+import argparse
+import csv
 import os
 from datetime import datetime
 import glob
+import sys
+
+from export_rapports import REPORT_FORMATS, read_report, read_report_columns, report_lock, write_report
+
+# Nom (sans extension) du rapport consolidé, exclu des rapports à analyser
+CONSOLIDATED_REPORT = 'rapport_consolide'
+
+# Colonnes indispensables d'un rapport de drawdown
+REPORT_REQUIRED_COLUMNS = [
+    'trade_number', 'direction', 'entry_time', 'exit_time', 'profit_loss',
+    'max_drawdown_points', 'max_drawdown_dollars', 'max_drawdown_percent',
+    'lowest_price_time'
+]
+
+# Colonnes qui identifient un trade, quel que soit le rapport d'où il vient
+# (le compte distingue des exécutions identiques sur deux comptes, ex. copy-trading)
+TRADE_IDENTITY_COLUMNS = ['account', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'quantity', 'direction']
+
+
+def trade_identities(df, columns):
+    """
+    Construit l'identité de chaque trade, normalisée pour comparer des rapports
+    de formats différents (dates en ns, prix en float, quantité en entier, compte en texte)
+    
+    Args:
+        df (DataFrame): Trades
+        columns (list): Colonnes d'identité à utiliser
+        
+    Returns:
+        MultiIndex: Identité de chaque ligne
+    """
+    import pandas as pd
+    
+    normalizers = {
+        'account': lambda values: values.astype(str).to_numpy(),
+        'entry_time': lambda values: pd.to_datetime(values).to_numpy('datetime64[ns]'),
+        'exit_time': lambda values: pd.to_datetime(values).to_numpy('datetime64[ns]'),
+        'entry_price': lambda values: values.astype(float).to_numpy(),
+        'exit_price': lambda values: values.astype(float).to_numpy(),
+        'quantity': lambda values: values.astype(int).to_numpy(),
+        'direction': lambda values: values.astype(str).to_numpy()
+    }
+    return pd.MultiIndex.from_arrays([normalizers[c](df[c]) for c in columns], names=columns)
+
+
+def find_report_files(reports_dir):
+    """
+    Liste les rapports de drawdown d'un dossier (CSV, Parquet, Feather)
+    Les rapports consolidés (nom par défaut, ou colonne source_file quel que soit
+    leur nom) sont exclus pour ne pas compter deux fois les trades
+    
+    Args:
+        reports_dir (str): Dossier contenant les rapports
+        
+    Returns:
+        list: Chemins des rapports, triés par nom
+    """
+    report_files = []
+    for extension in REPORT_FORMATS.values():
+        report_files.extend(glob.glob(os.path.join(reports_dir, f'*{extension}')))
+    
+    return sorted(f for f in report_files
+                  if not os.path.basename(f).startswith(CONSOLIDATED_REPORT) and not is_consolidated_report(f))
+
+
+def is_consolidated_report(file_path):
+    """
+    Reconnaît un rapport consolidé à sa colonne source_file (lecture de l'en-tête seulement)
+    
+    Args:
+        file_path (str): Chemin du rapport
+        
+    Returns:
+        bool: True si le rapport est un rapport consolidé
+    """
+    try:
+        return 'source_file' in read_report_columns(file_path)
+    except (ImportError, OSError, ValueError, UnicodeDecodeError, csv.Error):
+        # Rapport illisible : gardé dans la liste, l'erreur sera signalée au chargement
+        return False
+
+
+def sniff_report_file(file_path):
+    """
+    Vérifie le format d'un rapport de drawdown à partir de son en-tête (ou schéma)
+    
+    Args:
+        file_path (str): Chemin vers le rapport (CSV, Parquet ou Feather)
+        
+    Returns:
+        list: Colonnes détectées
+        
+    Raises:
+        ValueError: Si des colonnes indispensables sont absentes
+    """
+    columns = read_report_columns(file_path)
+    missing = [c for c in REPORT_REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Rapport invalide, colonnes manquantes : {missing}")
+    return columns
+
 
 class GlobalDrawdownAnalyzer:
     """
@@ -26,8 +134,10 @@ class GlobalDrawdownAnalyzer:
         
     def load_all_reports(self):
         """
-        Charge tous les rapports CSV du dossier Rapports
+        Charge tous les rapports (CSV, Parquet, Feather) du dossier Rapports
         """
+        import pandas as pd
+        
         print("="*60)
         print("📊 ANALYSE GLOBALE DES DRAWDOWNS")
         print("="*60 + "\n")
@@ -40,24 +150,24 @@ class GlobalDrawdownAnalyzer:
             print("   Exécutez d'abord le calculateur pour générer des rapports.")
             return None
         
-        # Trouver tous les fichiers CSV dans le dossier
-        csv_files = glob.glob(os.path.join(self.reports_dir, '*.csv'))
+        # Trouver tous les rapports dans le dossier
+        report_files = find_report_files(self.reports_dir)
         
-        if len(csv_files) == 0:
+        if len(report_files) == 0:
             print(f"❌ Aucun rapport trouvé dans {self.reports_dir}/")
             print("   Exécutez d'abord le calculateur pour générer des rapports.")
             return None
         
-        print(f"✅ {len(csv_files)} rapport(s) trouvé(s)\n")
+        print(f"✅ {len(report_files)} rapport(s) trouvé(s)\n")
         
-        # Charger tous les CSV
+        # Charger tous les rapports
         all_dataframes = []
-        for csv_file in csv_files:
-            print(f"   📄 Chargement: {os.path.basename(csv_file)}")
-            df = pd.read_csv(csv_file)
+        for report_file in report_files:
+            print(f"   📄 Chargement: {os.path.basename(report_file)}")
+            df = read_report(report_file)
             
             # Ajouter le nom du fichier comme colonne pour traçabilité
-            df['source_file'] = os.path.basename(csv_file)
+            df['source_file'] = os.path.basename(report_file)
             
             all_dataframes.append(df)
         
@@ -221,52 +331,182 @@ class GlobalDrawdownAnalyzer:
             print(f"   Fichier: {trade['source_file']}")
             print()
     
-    def export_consolidated_report(self, output_file='rapport_consolide.csv'):
+    def export_consolidated_report(self, output_file=None, fmt='csv', append=False):
         """
-        Exporte un rapport consolidé de tous les trades
+        Exporte un rapport consolidé de tous les trades (écriture atomique)
         
         Args:
-            output_file (str): Nom du fichier de sortie
+            output_file (str): Nom du fichier de sortie (défaut : rapport_consolide + extension du format)
+            fmt (str): Format si le nom n'a pas d'extension reconnue : 'csv', 'parquet' ou 'feather'
+            append (bool): N'ajoute que les trades absents du consolidé existant
+                (même compte, heures, prix, quantité et direction)
         """
         if self.all_trades is None or len(self.all_trades) == 0:
             return
         
-        output_path = os.path.join(self.reports_dir, output_file)
+        if output_file is None:
+            output_file = CONSOLIDATED_REPORT + REPORT_FORMATS[fmt]
+        elif not output_file.lower().endswith(tuple(REPORT_FORMATS.values())):
+            # Sans extension reconnue, le rapport prend celle du format demandé
+            output_file += REPORT_FORMATS[fmt]
         
-        print(f"\n💾 Export du rapport consolidé...")
-        self.all_trades.to_csv(output_path, index=False)
-        print(f"✅ Rapport consolidé sauvegardé: {output_path}")
+        output_path = os.path.join(self.reports_dir, output_file)
+        new_trades = self.all_trades
+        
+        # Un trade présent dans plusieurs rapports (même compte, heures, prix, quantité
+        # et direction) n'est consolidé qu'une fois, avec ou sans --append
+        identity_columns = [c for c in TRADE_IDENTITY_COLUMNS if c in new_trades.columns]
+        new_trades = new_trades[~trade_identities(new_trades, identity_columns).duplicated()]
+        
+        # Verrou tenu de la lecture du consolidé jusqu'à l'écriture (write_report le réutilise)
+        with report_lock(output_path):
+            if append and os.path.exists(output_path):
+                # Un trade déjà consolidé n'est pas ajouté une seconde fois,
+                # même si son rapport a été régénéré avec des trades en plus
+                consolidated_columns = read_report_columns(output_path)
+                identity_columns = [c for c in identity_columns if c in consolidated_columns]
+                consolidated = read_report(output_path, columns=identity_columns)
+                new_identities = trade_identities(new_trades, identity_columns)
+                new_trades = new_trades[~new_identities.isin(trade_identities(consolidated, identity_columns))]
+                
+                if len(new_trades) == 0:
+                    print(f"\n✅ Rapport consolidé déjà à jour: {output_path}")
+                    return
+            
+            print(f"\n💾 Export du rapport consolidé...")
+            write_report(new_trades, output_path, append=append)
+            print(f"✅ Rapport consolidé sauvegardé: {output_path} ({len(new_trades)} trade(s) écrit(s))")
 
 
-def main():
+def validate_reports(file_paths):
     """
-    Fonction principale
+    Vérifie le format des rapports en lisant uniquement leur en-tête (ou schéma)
+    
+    Args:
+        file_paths (list): Chemins des rapports à vérifier
+        
+    Returns:
+        bool: True si tous les rapports sont valides
     """
-    print("\n")
+    all_valid = True
     
+    for file_path in file_paths:
+        name = os.path.basename(file_path)
+        try:
+            sniff_report_file(file_path)
+            print(f"✅ {name} : rapport valide")
+        except (ImportError, OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+            print(f"❌ {name} : {e}")
+            all_valid = False
+    
+    return all_valid
+
+
+def run_analysis(reports_dir='Rapports', top_n=5, output_file=None, fmt='csv', append=False):
+    """
+    Enchaîne l'analyse complète des rapports et l'export consolidé
+    
+    Args:
+        reports_dir (str): Dossier contenant les rapports
+        top_n (int): Nombre de trades affichés dans les classements
+        output_file (str): Nom du rapport consolidé (défaut : rapport_consolide + extension)
+        fmt (str): Format du rapport consolidé : 'csv', 'parquet' ou 'feather'
+        append (bool): Ajoute au consolidé existant au lieu de le réécrire
+        
+    Returns:
+        bool: True si des rapports ont été analysés
+    """
     # Créer l'analyseur
-    analyzer = GlobalDrawdownAnalyzer()
+    analyzer = GlobalDrawdownAnalyzer(reports_dir)
     
     # Charger tous les rapports
     data = analyzer.load_all_reports()
     
     if data is None:
-        return
+        return False
     
     # Générer les analyses
     analyzer.generate_global_statistics()
     analyzer.analyze_by_direction()
     analyzer.analyze_by_date()
-    analyzer.find_worst_trades(5)
-    analyzer.find_best_trades(5)
+    analyzer.find_worst_trades(top_n)
+    analyzer.find_best_trades(top_n)
     
     # Exporter le rapport consolidé
-    analyzer.export_consolidated_report()
+    analyzer.export_consolidated_report(output_file, fmt, append)
     
     print("\n" + "="*60)
     print("🎉 ANALYSE TERMINÉE")
     print("="*60 + "\n")
+    
+    return True
+
+
+def build_parser():
+    """
+    Construit le parseur de la ligne de commande
+    
+    Returns:
+        ArgumentParser: Parseur avec les sous-commandes analyze et validate
+    """
+    parser = argparse.ArgumentParser(
+        description="Analyse globale des rapports de drawdown NQ. "
+                    "Sans sous-commande, analyse le dossier Rapports."
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    
+    analyze_parser = subparsers.add_parser('analyze', help="Analyse tous les rapports d'un dossier")
+    analyze_parser.add_argument('--reports-dir', default='Rapports',
+                                help="Dossier contenant les rapports (défaut : Rapports)")
+    analyze_parser.add_argument('--top', type=int, default=5,
+                                help="Nombre de trades dans les classements (défaut : 5)")
+    analyze_parser.add_argument('-o', '--output', default=None,
+                                help="Nom du rapport consolidé (défaut : rapport_consolide.csv)")
+    analyze_parser.add_argument('--format', choices=list(REPORT_FORMATS), default='csv',
+                                help="Format du rapport consolidé (défaut : csv ; parquet/feather nécessitent pyarrow)")
+    analyze_parser.add_argument('--append', action='store_true',
+                                help="Ajoute seulement les nouveaux trades au consolidé existant "
+                                     "(parquet/feather : une nouvelle partie dans le dossier du consolidé)")
+    
+    validate_parser = subparsers.add_parser('validate',
+                                            help="Vérifie le format des rapports (en-têtes uniquement)")
+    validate_parser.add_argument('files', nargs='*',
+                                 help="Rapports à vérifier (défaut : tous les rapports de --reports-dir)")
+    validate_parser.add_argument('--reports-dir', default='Rapports',
+                                 help="Dossier contenant les rapports (défaut : Rapports)")
+    
+    return parser
+
+
+def main(argv=None):
+    """
+    Point d'entrée de la ligne de commande
+    
+    Args:
+        argv (list): Arguments (défaut : sys.argv[1:])
+        
+    Returns:
+        int: Code de sortie (0 si succès)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.command == 'validate':
+        files = args.files or find_report_files(args.reports_dir)
+        if not files:
+            print(f"❌ Aucun rapport trouvé dans {args.reports_dir}/")
+            return 1
+        return 0 if validate_reports(files) else 1
+    
+    print("\n")
+    
+    if args.command == 'analyze':
+        analyzed = run_analysis(args.reports_dir, args.top, args.output, args.format, args.append)
+    else:
+        analyzed = run_analysis()
+    
+    return 0 if analyzed else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+Écriture et lecture des rapports de drawdown (CSV, Parquet, Feather)
+Toutes les écritures sont atomiques : fichier temporaire puis renommage,
+un rapport n'est donc jamais laissé à moitié écrit par un traitement concurrent.
+Les écritures d'un même dossier de rapports sont de plus sérialisées par un verrou
+exclusif (fichier .rapports.lock), aucun ajout n'est donc perdu entre plusieurs
+traitements parallèles
+
+Parquet et Feather ne permettent pas d'ajouter des lignes à un fichier : un rapport
+en ajout devient un dossier (rapport.parquet/) où chaque ajout est un nouveau fichier
+part-00001.parquet, part-00002.parquet... ; l'historique n'est jamais relu ni réécrit
+
+Parquet et Feather nécessitent pyarrow (pip install pyarrow).
+"""
+
+import csv
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# Formats supportés et leur extension
+REPORT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather'
+}
+
+# Fichier de verrou, un seul par dossier de rapports
+LOCK_FILE = '.rapports.lock'
+
+# Verrous déjà détenus par le thread courant (verrou ré-entrant)
+_held_locks = threading.local()
+
+
+def read_csv_header(file_path, skiprows=0):
+    """
+    Lit uniquement la ligne d'en-tête d'un fichier CSV (sans charger les données)
+    
+    Args:
+        file_path (str): Chemin vers le fichier CSV
+        skiprows (int): Nombre de lignes à sauter avant l'en-tête
+    
+    Returns:
+        list: Noms des colonnes (liste vide si aucun en-tête)
+    """
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        for line_number, row in enumerate(reader):
+            if line_number < skiprows:
+                continue
+            # Comme pandas, on ignore les lignes vides avant l'en-tête
+            if any(cell.strip() for cell in row):
+                return [cell.strip() for cell in row]
+    return []
+
+
+def report_format(file_path):
+    """
+    Déduit le format d'un rapport à partir de son extension
+    
+    Args:
+        file_path (str): Chemin du rapport
+    
+    Returns:
+        str: 'csv', 'parquet' ou 'feather'
+    
+    Raises:
+        ValueError: Si l'extension n'est pas reconnue
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    for fmt, fmt_extension in REPORT_FORMATS.items():
+        if extension == fmt_extension:
+            return fmt
+    raise ValueError(f"Format de rapport non supporté : {file_path} (formats : {list(REPORT_FORMATS)})")
+
+
+def require_pyarrow(fmt):
+    """
+    Vérifie que pyarrow est installé pour les formats qui en ont besoin
+    
+    Args:
+        fmt (str): Format du rapport
+    
+    Raises:
+        ImportError: Si pyarrow est absent pour Parquet/Feather
+    """
+    if fmt == 'csv':
+        return
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Le format {fmt} nécessite pyarrow : pip install pyarrow")
+
+
+def report_parts(file_path):
+    """
+    Liste les fichiers d'un rapport : le fichier lui-même, ou les parties
+    part-*.parquet / part-*.feather d'un rapport en dossier (dans l'ordre des ajouts)
+    
+    Args:
+        file_path (str): Chemin du rapport
+    
+    Returns:
+        list: Chemins des fichiers du rapport
+    """
+    if not os.path.isdir(file_path):
+        return [file_path]
+    
+    extension = REPORT_FORMATS[report_format(file_path)]
+    return sorted(os.path.join(file_path, name) for name in os.listdir(file_path)
+                  if name.startswith('part-') and name.endswith(extension))
+
+
+def read_report(file_path, columns=None):
+    """
+    Lit un rapport, quel que soit son format (fichier ou dossier de parties)
+    
+    Args:
+        file_path (str): Chemin du rapport
+        columns (list): Colonnes à lire (optionnel, toutes par défaut)
+    
+    Returns:
+        DataFrame: Contenu du rapport
+    """
+    import pandas as pd
+    
+    fmt = report_format(file_path)
+    require_pyarrow(fmt)
+    
+    parts = []
+    for part_path in report_parts(file_path):
+        if fmt == 'parquet':
+            parts.append(pd.read_parquet(part_path, columns=columns))
+        elif fmt == 'feather':
+            parts.append(pd.read_feather(part_path, columns=columns))
+        else:
+            parts.append(pd.read_csv(part_path, usecols=columns))
+    
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_report_columns(file_path):
+    """
+    Lit uniquement les noms de colonnes d'un rapport (en-tête ou schéma)
+    
+    Args:
+        file_path (str): Chemin du rapport
+    
+    Returns:
+        list: Noms des colonnes
+    """
+    fmt = report_format(file_path)
+    require_pyarrow(fmt)
+    
+    # Rapport en dossier : colonnes de toutes les parties, dans l'ordre d'apparition
+    columns = []
+    for part_path in report_parts(file_path):
+        if fmt == 'parquet':
+            import pyarrow.parquet as pq
+            part_columns = pq.read_schema(part_path).names
+        elif fmt == 'feather':
+            import pyarrow.ipc
+            with pyarrow.ipc.open_file(part_path) as reader:
+                part_columns = reader.schema.names
+        else:
+            part_columns = read_csv_header(part_path)
+        columns.extend(c for c in part_columns if c not in columns)
+    return columns
+
+
+@contextmanager
+def report_lock(file_path):
+    """
+    Verrou exclusif sur le dossier d'un fichier, partagé entre threads et processus
+    Le verrou porte sur un unique fichier caché .rapports.lock du dossier (jamais
+    supprimé : un fichier supprimé puis recréé pourrait être verrouillé deux fois) ;
+    il est ré-entrant dans un même thread
+    
+    Args:
+        file_path (str): Chemin du fichier à protéger
+    """
+    lock_path = os.path.join(os.path.dirname(os.path.abspath(file_path)), LOCK_FILE)
+    
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    
+    if lock_path in held:
+        yield
+        return
+    
+    with open(lock_path, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt.locking abandonne après 10 essais : on réessaie jusqu'à obtenir le verrou
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        
+        held.add(lock_path)
+        try:
+            yield
+        finally:
+            held.discard(lock_path)
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(file_path, write_function):
+    """
+    Écrit un fichier de façon atomique : écriture dans un fichier temporaire
+    du même dossier, puis renommage vers le fichier final
+    
+    Args:
+        file_path (str): Chemin du fichier final
+        write_function (callable): Fonction qui écrit le contenu dans le chemin reçu
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    temp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex[:12]}.tmp")
+    
+    # Créé en 0666 filtré par l'umask, comme un fichier ordinaire (sans modifier l'umask du processus)
+    os.close(os.open(temp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+    
+    try:
+        write_function(temp_path)
+        # Un fichier remplacé garde ses droits
+        if os.path.isfile(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o777)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_report(data, file_path, append=False):
+    """
+    Écrit un rapport (format déduit de l'extension) de façon atomique,
+    sous le verrou du rapport (les ajouts concurrents sont tous conservés)
+    
+    Args:
+        data (dict | DataFrame): Colonnes du rapport (dict de tableaux) ou DataFrame
+        file_path (str): Chemin du rapport
+        append (bool): Ajoute les lignes à la fin du rapport existant
+    
+    Returns:
+        DataFrame: Les lignes écrites
+    """
+    import pandas as pd
+    
+    fmt = report_format(file_path)
+    require_pyarrow(fmt)
+    
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    
+    with report_lock(file_path):
+        append = append and os.path.exists(file_path)
+        
+        if fmt == 'csv':
+            existing_columns = read_csv_header(file_path) if append else []
+            
+            if append and sorted(existing_columns) == sorted(df.columns):
+                # Ajout en fin de fichier sur une copie, sans relire ni réécrire l'historique
+                def write_csv(temp_path):
+                    shutil.copyfile(file_path, temp_path)
+                    df[existing_columns].to_csv(temp_path, mode='a', header=False, index=False)
+            else:
+                if append:
+                    # Colonnes différentes : on fusionne avec l'historique puis on réécrit
+                    full_df = pd.concat([pd.read_csv(file_path), df], ignore_index=True)
+                else:
+                    full_df = df
+                
+                def write_csv(temp_path):
+                    full_df.to_csv(temp_path, index=False)
+            
+            atomic_write(file_path, write_csv)
+            return df
+        
+        if not append:
+            if os.path.isdir(file_path):
+                # Un rapport réécrit remplace le dossier de parties laissé par des ajouts
+                old_path = os.path.join(os.path.dirname(os.path.abspath(file_path)),
+                                        f".{os.path.basename(file_path)}.old")
+                if os.path.exists(old_path):
+                    shutil.rmtree(old_path)
+                os.replace(file_path, old_path)
+                write_columnar_file(df, file_path, fmt)
+                shutil.rmtree(old_path)
+            else:
+                write_columnar_file(df, file_path, fmt)
+            return df
+        
+        # Parquet et Feather ne supportent pas l'ajout : les lignes ajoutées vont dans
+        # une nouvelle partie du dossier du rapport, sans relire ni réécrire l'historique
+        extension = REPORT_FORMATS[fmt]
+        if not os.path.isdir(file_path):
+            # Premier ajout : le rapport existant devient la première partie du dossier
+            first_part = os.path.join(os.path.dirname(os.path.abspath(file_path)),
+                                      f".{os.path.basename(file_path)}.part")
+            os.replace(file_path, first_part)
+            os.makedirs(file_path)
+            os.replace(first_part, os.path.join(file_path, f"part-00000{extension}"))
+        
+        part_numbers = [int(os.path.basename(part)[5:-len(extension)]) for part in report_parts(file_path)]
+        part_number = max(part_numbers, default=-1) + 1
+        write_columnar_file(df, os.path.join(file_path, f"part-{part_number:05d}{extension}"), fmt)
+        
+        return df
+
+
+def write_columnar_file(df, file_path, fmt):
+    """
+    Écrit un fichier Parquet ou Feather de façon atomique
+    
+    Args:
+        df (DataFrame): Lignes à écrire
+        file_path (str): Chemin du fichier
+        fmt (str): 'parquet' ou 'feather'
+    """
+    if fmt == 'parquet':
+        atomic_write(file_path, lambda temp_path: df.to_parquet(temp_path, index=False))
+    else:
+        # Feather exige un index par défaut
+        atomic_write(file_path, lambda temp_path: df.reset_index(drop=True).to_feather(temp_path))
@@ -2,40 +2,355 @@
 Script de calcul du Drawdown Maximum pour les trades NQ
 Auteur: Automatisation trading
 Date: 2026-01-12
+
+Utilisation :
+    python nq_drawdown_calculator.py                          (mode interactif)
+    python nq_drawdown_calculator.py calc ORDRES MARCHE       (un fichier d'ordres)
+    python nq_drawdown_calculator.py batch --pair ORDRES MARCHE --pair ...
+    python nq_drawdown_calculator.py validate FICHIER [FICHIER ...]
+
+pandas et numpy ne sont importés que dans les fonctions qui en ont besoin :
+`--help` et `validate` répondent sans les charger.
 """
 
-import pandas as pd
-import numpy as np
 from datetime import datetime
+import argparse
+import csv
+import json
 import os
+import re
+import sys
+
+from export_rapports import REPORT_FORMATS, atomic_write, read_csv_header, report_lock, write_report
+
+# Version du moteur de drawdown : à incrémenter à chaque changement des résultats,
+# les entrées du cache calculées par une autre version sont alors ignorées
+CACHE_VERSION = 4
+
+# Nombre maximum d'entrées gardées dans le cache (les moins récemment utilisées sont retirées)
+CACHE_MAX_ENTRIES = 100_000
+
+# Nombre de lignes à sauter avant l'en-tête des ordres complétés
+ORDERS_SKIPROWS = 5
+
+# Durée des bougies exportées depuis le chart Rithmic (en secondes)
+BAR_SECONDS = 1
+
+# Nombre maximum de prix rassemblés à la fois par le moteur de drawdown
+# (environ 40 octets de tableaux temporaires par prix, soit ~80 Mo)
+SEGMENT_BUDGET = 2_000_000
+
+# Traitement des bougies à cheval sur l'entrée ou la sortie d'un trade :
+#   legacy      : bougies terminées entre l'entrée et la sortie (comportement historique :
+#                 la bougie en bordure d'entrée est incluse, celle de sortie exclue)
+#   include     : bougies entières incluses aux deux bordures (drawdown majoré)
+#   exclude     : seules les bougies entièrement comprises dans le trade
+#   interpolate : bougies entières + ticks pour les portions de bougies en bordure
+EDGE_POLICIES = ('legacy', 'include', 'exclude', 'interpolate')
+
+# Colonnes des rapports : identité du trade puis statistiques de drawdown
+TRADE_COLUMNS = [
+    'trade_number', 'account', 'direction', 'entry_time', 'entry_price',
+    'exit_time', 'exit_price', 'quantity', 'profit_loss'
+]
+DRAWDOWN_COLUMNS = [
+    'max_drawdown_points', 'max_drawdown_dollars', 'max_drawdown_percent',
+    'lowest_price', 'lowest_price_time'
+]
+
+# Colonnes indispensables du fichier des ordres
+ORDERS_REQUIRED_COLUMNS = [
+    'Account', 'Buy/Sell', 'Create Time (RST)', 'Update Time (RST)',
+    'Avg Fill Price', 'Qty To Fill'
+]
+
+
+def sniff_orders_file(file_path):
+    """
+    Vérifie le format du fichier des ordres à partir de son en-tête
+    
+    Args:
+        file_path (str): Chemin vers le fichier CSV des ordres
+        
+    Returns:
+        list: Colonnes détectées
+        
+    Raises:
+        ValueError: Si des colonnes indispensables sont absentes
+    """
+    columns = read_csv_header(file_path, skiprows=ORDERS_SKIPROWS)
+    missing = [c for c in ORDERS_REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Fichier des ordres invalide, colonnes manquantes : {missing}")
+    return columns
+
+
+def sniff_market_data_format(file_path):
+    """
+    Détecte le format du fichier de données de marché à partir de son en-tête
+    
+    Args:
+        file_path (str): Chemin vers le fichier CSV des données de marché
+        
+    Returns:
+        str: 'ohlc' ou 'tick'
+        
+    Raises:
+        ValueError: Si le format n'est pas reconnu ou si des colonnes manquent
+    """
+    columns = read_csv_header(file_path)
+    
+    # Format 1 : Bougies OHLC (Chart export)
+    if 'Bar Ending Time' in columns or 'Series.Low' in columns:
+        missing = [c for c in ['Series.Low', 'Series.High'] if c not in columns]
+        if 'Bar Ending Time' not in columns and 'Timestamp' not in columns:
+            missing.append('Bar Ending Time')
+        if missing:
+            raise ValueError(f"Fichier OHLC invalide, colonnes manquantes : {missing}")
+        return 'ohlc'
+    
+    # Format 2 : Tick-by-tick (Trade History)
+    if 'Rithmic Date/Time (RST)' in columns or 'Trade Price' in columns:
+        missing = [c for c in ['Rithmic Date/Time (RST)', 'Trade Price'] if c not in columns]
+        if missing:
+            raise ValueError(f"Fichier tick invalide, colonnes manquantes : {missing}")
+        return 'tick'
+    
+    raise ValueError(f"Format de données de marché non supporté (colonnes : {columns[:5]}...)")
+
+
+def parse_resolution(resolution):
+    """
+    Convertit une résolution de bougies ('1s', '5s', '1m', '1min'...) en secondes
+    
+    Args:
+        resolution (str): Résolution souhaitée
+        
+    Returns:
+        int: Durée d'une bougie en secondes
+        
+    Raises:
+        ValueError: Si la résolution n'est pas reconnue
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*(s|sec|m|min)\s*', str(resolution).lower())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Résolution non reconnue : {resolution} (exemples : 1s, 5s, 1m)")
+    
+    seconds = int(match.group(1))
+    if match.group(2) in ('m', 'min'):
+        seconds *= 60
+    return seconds
+
+
+def timestamps_to_ns(timestamps):
+    """
+    Convertit une colonne de dates en entiers (nanosecondes depuis epoch)
+    
+    Args:
+        timestamps (Series | array): Dates à convertir
+        
+    Returns:
+        ndarray: Tableau int64
+    """
+    import numpy as np
+    
+    return np.asarray(timestamps, dtype='datetime64[ns]').view('i8')
+
+
+def resample_bars(market_data_df, data_format, bar_seconds):
+    """
+    Construit des bougies de `bar_seconds` secondes (Low/High) en une passe vectorisée
+    Accepte des ticks ou des bougies plus fines ; le Timestamp est l'heure de fin de bougie
+    
+    Args:
+        market_data_df (DataFrame): Données de marché triées par Timestamp
+        data_format (str): 'tick' ou 'ohlc'
+        bar_seconds (int): Durée des bougies à construire
+        
+    Returns:
+        DataFrame: Bougies avec les colonnes Timestamp, Low et High
+    """
+    import numpy as np
+    import pandas as pd
+    
+    timestamps = timestamps_to_ns(market_data_df['Timestamp'])
+    if data_format == 'ohlc':
+        lows = market_data_df['Low'].to_numpy(dtype='f8')
+        highs = market_data_df['High'].to_numpy(dtype='f8')
+    else:
+        lows = highs = market_data_df['Trade Price'].to_numpy(dtype='f8')
+    
+    if len(timestamps) == 0:
+        return pd.DataFrame({'Timestamp': pd.to_datetime([]), 'Low': [], 'High': []})
+    
+    # Heure de fin de la bougie : une donnée à t appartient à la bougie ]fin - durée, fin]
+    bar_ns = bar_seconds * 1_000_000_000
+    bar_ends = -(-timestamps // bar_ns) * bar_ns
+    
+    # Début de chaque groupe de données appartenant à la même bougie
+    starts = np.flatnonzero(np.r_[True, bar_ends[1:] != bar_ends[:-1]])
+    
+    return pd.DataFrame({
+        'Timestamp': pd.to_datetime(bar_ends[starts]),
+        'Low': np.minimum.reduceat(lows, starts),
+        'High': np.maximum.reduceat(highs, starts)
+    })
+
+
+def mix_hash(values):
+    """
+    Mélange des entiers 64 bits (splitmix64), élément par élément et sans boucle
+    
+    Args:
+        values (ndarray): Tableau uint64
+        
+    Returns:
+        ndarray: Tableau uint64 mélangé
+    """
+    import numpy as np
+    
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def gathered_extremes(values, starts, lengths, find_max):
+    """
+    Minimum (ou maximum) et sa première position sur des segments non vides,
+    en rassemblant leurs indices bout à bout puis en une seule passe reduceat
+    
+    Args:
+        values (ndarray): Valeurs (prix)
+        starts (ndarray): Indice de début de chaque segment
+        lengths (ndarray): Longueur (> 0) de chaque segment
+        find_max (bool): True pour le maximum, False pour le minimum
+        
+    Returns:
+        tuple: (extrêmes, positions) ; position -1 si le segment ne contient que des NaN
+    """
+    import numpy as np
+    
+    # Les segments peuvent se chevaucher si des trades se chevauchent
+    offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+    seg_ids = np.repeat(np.arange(len(starts)), lengths)
+    indices = np.arange(lengths.sum()) - offsets[seg_ids] + starts[seg_ids]
+    gathered = values[indices]
+    
+    # fmin/fmax ignorent les prix manquants (NaN)
+    reducer = np.fmax if find_max else np.fmin
+    seg_extremes = reducer.reduceat(gathered, offsets)
+    
+    # Première occurrence de l'extrême dans chaque segment
+    hits = np.flatnonzero(gathered == seg_extremes[seg_ids])
+    found_ids, first_hits = np.unique(seg_ids[hits], return_index=True)
+    
+    positions = np.full(len(starts), -1, dtype='i8')
+    positions[found_ids] = indices[hits[first_hits]]
+    return seg_extremes, positions
+
+
+def segment_extremes(values, starts, stops, find_max=False, budget=None):
+    """
+    Calcule le minimum (ou maximum) et sa position sur chaque segment [start, stop[
+    Les segments sont traités par paquets d'au plus `budget` prix rassemblés, la mémoire
+    reste donc bornée même avec des trades longs ou qui se chevauchent
+    
+    Args:
+        values (ndarray): Valeurs (prix)
+        starts (ndarray): Indice de début de chaque segment
+        stops (ndarray): Indice de fin (exclu) de chaque segment
+        find_max (bool): True pour le maximum, False pour le minimum
+        budget (int): Nombre maximum de prix rassemblés par paquet (défaut : SEGMENT_BUDGET)
+        
+    Returns:
+        tuple: (extrêmes, positions) ; NaN et -1 pour les segments vides
+    """
+    import numpy as np
+    
+    if budget is None:
+        budget = SEGMENT_BUDGET
+    
+    starts = np.asarray(starts, dtype='i8')
+    lengths = np.clip(np.asarray(stops, dtype='i8') - starts, 0, None)
+    extremes = np.full(len(starts), np.nan)
+    positions = np.full(len(starts), -1, dtype='i8')
+    
+    # Segments plus longs que le budget : réduits directement sur une vue de values (sans copie)
+    reducer = np.fmax if find_max else np.fmin
+    for j in np.flatnonzero(lengths > budget):
+        window = values[starts[j]:starts[j] + lengths[j]]
+        extremes[j] = reducer.reduce(window)
+        if not np.isnan(extremes[j]):
+            positions[j] = starts[j] + np.argmax(window == extremes[j])
+    
+    # Autres segments : rassemblés par paquets (chaque paquet fait au plus 2 x budget prix)
+    small = np.flatnonzero((lengths > 0) & (lengths <= budget))
+    if len(small) == 0:
+        return extremes, positions
+    
+    chunk_ids = np.r_[0, np.cumsum(lengths[small])[:-1]] // budget
+    chunk_bounds = np.flatnonzero(np.r_[True, chunk_ids[1:] != chunk_ids[:-1], True])
+    
+    for chunk_start, chunk_stop in zip(chunk_bounds[:-1], chunk_bounds[1:]):
+        chunk = small[chunk_start:chunk_stop]
+        extremes[chunk], positions[chunk] = gathered_extremes(values, starts[chunk], lengths[chunk], find_max)
+    
+    return extremes, positions
+
 
 class NQDrawdownCalculator:
     """
     Classe pour calculer le drawdown maximum de chaque trade NQ
     """
     
-    def __init__(self, orders_file, market_data_file):
+    def __init__(self, orders_file, market_data_file, cache_file=None,
+                 edge_policy='legacy', resolution=None, tick_data_file=None):
         """
         Initialise le calculateur avec les fichiers CSV
         
         Args:
             orders_file (str): Chemin vers le fichier CSV des ordres
             market_data_file (str): Chemin vers le fichier CSV des données de marché
+            cache_file (str): Chemin du cache des drawdowns (optionnel, False pour désactiver)
+            edge_policy (str): Traitement des bougies en bordure (voir EDGE_POLICIES)
+            resolution (str): Résolution des bougies ('5s', '1m'...), construites à la volée (optionnel)
+            tick_data_file (str): Fichier tick-by-tick pour interpoler les bougies en bordure (optionnel)
         """
+        if edge_policy not in EDGE_POLICIES:
+            raise ValueError(f"Traitement des bougies en bordure inconnu : {edge_policy} (choix : {EDGE_POLICIES})")
+        
         self.orders_file = orders_file
         self.market_data_file = market_data_file
-        self.trades = []
-        self.results = []
+        self.tick_data_file = tick_data_file
+        self.edge_policy = edge_policy
+        self.resolution = resolution
+        self.bar_seconds = parse_resolution(resolution) if resolution else BAR_SECONDS
+        self.trades = {}
+        self.results = {}
+        
+        # Cache des drawdowns déjà calculés (réutilisé d'une exécution à l'autre)
+        if cache_file is None:
+            cache_file = os.path.join('Rapports', '.cache_drawdowns.json')
+        self.cache_file = cache_file
+        self.cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
         
     def load_orders(self):
         """
         Charge et parse le fichier des ordres exécutés
         """
+        import pandas as pd
+        
         print("📂 Chargement du fichier des ordres...")
         
+        # Vérifier l'en-tête avant de lire tout le fichier
+        sniff_orders_file(self.orders_file)
+        
         # Lire le fichier CSV
         # Le fichier a une structure spéciale avec "Completed Orders" comme en-tête
-        df = pd.read_csv(self.orders_file, skiprows=5)  # Skip les premières lignes jusqu'aux ordres complétés
+        df = pd.read_csv(self.orders_file, skiprows=ORDERS_SKIPROWS)  # Skip les premières lignes jusqu'aux ordres complétés
         
         # Nettoyer les données vides
         df = df.dropna(subset=['Account'])
@@ -64,77 +379,91 @@ class NQDrawdownCalculator:
             orders_df (DataFrame): DataFrame des ordres
             
         Returns:
-            list: Liste de dictionnaires contenant les informations de chaque trade
+            dict: Colonnes des trades (TRADE_COLUMNS), une valeur par trade
         """
+        import numpy as np
+        
         print("🔍 Identification des trades complets...")
         
-        trades = []
+        accounts = orders_df['Account'].astype(str).to_numpy(dtype=object)
+        sides = orders_df['Buy/Sell'].to_numpy()
+        create_times = orders_df['Create Time'].to_numpy(dtype='datetime64[ns]')
+        update_times = orders_df['Update Time'].to_numpy(dtype='datetime64[ns]')
+        fill_prices = orders_df['Avg Fill Price'].to_numpy(dtype='f8')
+        quantities = orders_df['Qty To Fill'].to_numpy(dtype='i8')
+        
+        # Positions des ordres d'entrée et de sortie de chaque trade
+        entries = []
+        exits = []
         i = 0
         
         while i < len(orders_df) - 1:
-            current_order = orders_df.iloc[i]
-            next_order = orders_df.iloc[i + 1]
-            
             # Déterminer quel ordre est venu en premier chronologiquement
             # On utilise Create Time pour l'ordre réel d'exécution
-            if current_order['Create Time'] < next_order['Create Time']:
-                first_order = current_order
-                second_order = next_order
+            if create_times[i] < create_times[i + 1]:
+                first, second = i, i + 1
             else:
-                first_order = next_order
-                second_order = current_order
+                first, second = i + 1, i
             
-            # Vérifier si c'est une paire Buy/Sell (trade long)
-            if first_order['Buy/Sell'] == 'B' and second_order['Buy/Sell'] == 'S':
-                trade = {
-                    'trade_number': len(trades) + 1,
-                    'direction': 'LONG',
-                    'entry_time': first_order['Create Time'],
-                    'entry_price': first_order['Avg Fill Price'],
-                    'exit_time': second_order['Update Time'],
-                    'exit_price': second_order['Avg Fill Price'],
-                    'quantity': first_order['Qty To Fill'],
-                    'profit_loss': (second_order['Avg Fill Price'] - first_order['Avg Fill Price']) * first_order['Qty To Fill']
-                }
-                trades.append(trade)
-                i += 2  # Passer à la paire suivante
-                
-            # Vérifier si c'est une paire Sell/Buy (trade short)
-            elif first_order['Buy/Sell'] == 'S' and second_order['Buy/Sell'] == 'B':
-                trade = {
-                    'trade_number': len(trades) + 1,
-                    'direction': 'SHORT',
-                    'entry_time': first_order['Create Time'],
-                    'entry_price': first_order['Avg Fill Price'],
-                    'exit_time': second_order['Update Time'],
-                    'exit_price': second_order['Avg Fill Price'],
-                    'quantity': first_order['Qty To Fill'],
-                    'profit_loss': (first_order['Avg Fill Price'] - second_order['Avg Fill Price']) * first_order['Qty To Fill']
-                }
-                trades.append(trade)
+            # Paire Buy/Sell (trade long) ou Sell/Buy (trade short)
+            if (sides[first], sides[second]) in (('B', 'S'), ('S', 'B')):
+                entries.append(first)
+                exits.append(second)
                 i += 2  # Passer à la paire suivante
             else:
                 i += 1
         
-        print(f"✅ {len(trades)} trades identifiés")
+        entries = np.array(entries, dtype='i8')
+        exits = np.array(exits, dtype='i8')
+        is_long = sides[entries] == 'B'
+        entry_prices = fill_prices[entries]
+        exit_prices = fill_prices[exits]
+        
+        trades = {
+            'trade_number': np.arange(1, len(entries) + 1),
+            'account': accounts[entries],
+            'direction': np.where(is_long, 'LONG', 'SHORT').astype(object),
+            'entry_time': create_times[entries],
+            'entry_price': entry_prices,
+            'exit_time': update_times[exits],
+            'exit_price': exit_prices,
+            'quantity': quantities[entries],
+            'profit_loss': np.where(is_long, exit_prices - entry_prices, entry_prices - exit_prices) * quantities[entries]
+        }
+        
+        print(f"✅ {len(entries)} trades identifiés")
         
         return trades
     
-    def load_market_data(self):
+    def load_market_data(self, file_path=None):
         """
         Charge les données de marché (tick-by-tick OU bougies OHLC)
         Détecte automatiquement le format du fichier
+        
+        Args:
+            file_path (str): Fichier à charger (défaut : fichier des données de marché)
         """
+        import pandas as pd
+        
+        if file_path is None:
+            file_path = self.market_data_file
+        
         print("📊 Chargement des données de marché NQ...")
         
-        # Lire le fichier CSV
-        df = pd.read_csv(self.market_data_file)
+        # Détecter le format à partir de l'en-tête, avant de lire tout le fichier
+        try:
+            data_format = sniff_market_data_format(file_path)
+        except ValueError as e:
+            print(f"❌ ERREUR : Format de fichier non reconnu!")
+            print(f"   {e}")
+            raise
         
-        # Détecter le format du fichier
+        # Lire le fichier CSV
+        df = pd.read_csv(file_path)
         columns = df.columns.tolist()
         
         # Format 1 : Bougies OHLC (nouveau format depuis Chart export)
-        if 'Bar Ending Time' in columns or 'Series.Low' in columns:
+        if data_format == 'ohlc':
             print("   Format détecté : Bougies OHLC (1 seconde)")
             
             # Renommer les colonnes si nécessaire
@@ -163,47 +492,180 @@ class NQDrawdownCalculator:
             return df, 'ohlc'
         
         # Format 2 : Tick-by-tick (ancien format depuis Trade History)
-        elif 'Rithmic Date/Time (RST)' in columns or 'Trade Price' in columns:
-            print("   Format détecté : Tick-by-tick")
+        print("   Format détecté : Tick-by-tick")
+        
+        # Convertir le timestamp (format ISO)
+        df['Timestamp'] = pd.to_datetime(df['Rithmic Date/Time (RST)'])
+        
+        # Convertir le prix
+        df['Trade Price'] = df['Trade Price'].astype(float)
+        
+        # Trier par timestamp
+        df = df.sort_values('Timestamp').reset_index(drop=True)
+        
+        print(f"✅ {len(df)} ticks chargés (de {df['Timestamp'].min()} à {df['Timestamp'].max()})")
+        
+        return df, 'tick'
+    
+    def prepare_market_data(self, market_data_df, data_format):
+        """
+        Prépare les séries utilisées par le moteur de drawdown :
+        bougies à la résolution demandée et ticks pour les bougies en bordure
+        
+        Args:
+            market_data_df (DataFrame): Données de marché chargées
+            data_format (str): 'tick' ou 'ohlc'
             
-            # Convertir le timestamp (format ISO)
-            df['Timestamp'] = pd.to_datetime(df['Rithmic Date/Time (RST)'])
+        Returns:
+            tuple: (données de marché, format, ticks ou None)
+        """
+        tick_data_df = None
+        
+        if data_format == 'tick':
+            # Sans résolution demandée, on travaille directement sur les ticks
+            if not self.resolution:
+                return market_data_df, 'tick', None
+            tick_data_df = market_data_df
+        elif self.tick_data_file:
+            tick_data_df, tick_format = self.load_market_data(self.tick_data_file)
+            if tick_format != 'tick':
+                raise ValueError("Le fichier des ticks doit être au format tick-by-tick")
+        
+        # Construire les bougies à la volée si la résolution diffère de l'export
+        if data_format == 'tick' or self.bar_seconds != BAR_SECONDS:
+            print(f"🕯️  Construction des bougies de {self.bar_seconds}s...")
+            market_data_df = resample_bars(market_data_df, data_format, self.bar_seconds)
+            print(f"✅ {len(market_data_df)} bougies construites")
+        
+        if self.edge_policy == 'interpolate' and tick_data_df is None:
+            print("⚠️  Pas de ticks disponibles : bougies en bordure traitées comme en mode legacy")
+        
+        return market_data_df, 'ohlc', tick_data_df
+    
+    def calculate_all_drawdowns(self, trades, market_data_df, data_format, tick_data_df=None):
+        """
+        Calcule le drawdown maximum de tous les trades en une passe vectorisée
+        Les fenêtres des trades sont trouvées par searchsorted puis réduites par reduceat
+        
+        Args:
+            trades (dict): Colonnes des trades (voir identify_trades)
+            market_data_df (DataFrame): Données de marché (triées par Timestamp)
+            data_format (str): 'tick' ou 'ohlc'
+            tick_data_df (DataFrame): Ticks pour interpoler les bougies en bordure (optionnel)
             
-            # Convertir le prix
-            df['Trade Price'] = df['Trade Price'].astype(float)
+        Returns:
+            dict: Colonnes des statistiques de drawdown (NaN/NaT si aucune donnée)
+        """
+        import numpy as np
+        import pandas as pd
+        
+        entry_ns = timestamps_to_ns(trades['entry_time'])
+        exit_ns = timestamps_to_ns(trades['exit_time'])
+        entry_prices = np.asarray(trades['entry_price'], dtype='f8')
+        quantities = np.asarray(trades['quantity'], dtype='f8')
+        is_long = np.asarray(trades['direction']) == 'LONG'
+        trade_count = len(entry_ns)
+        
+        # Chaque fenêtre : (heures, prix bas, prix hauts, début, fin) par trade
+        windows = []
+        
+        if data_format == 'tick':
+            times = timestamps_to_ns(market_data_df['Timestamp'])
+            prices = market_data_df['Trade Price'].to_numpy(dtype='f8')
+            windows.append((times, prices, prices,
+                            np.searchsorted(times, entry_ns, side='left'),
+                            np.searchsorted(times, exit_ns, side='right')))
+        else:
+            # Une bougie datée de sa fin couvre ]fin - durée, fin]
+            bar_ns = self.bar_seconds * 1_000_000_000
+            bar_ends = timestamps_to_ns(market_data_df['Timestamp'])
+            lows = market_data_df['Low'].to_numpy(dtype='f8')
+            highs = market_data_df['High'].to_numpy(dtype='f8')
             
-            # Trier par timestamp
-            df = df.sort_values('Timestamp').reset_index(drop=True)
+            edge_policy = self.edge_policy
+            if edge_policy == 'interpolate' and tick_data_df is None:
+                edge_policy = 'legacy'
             
-            print(f"✅ {len(df)} ticks chargés (de {df['Timestamp'].min()} à {df['Timestamp'].max()})")
+            if edge_policy == 'legacy':
+                # Bougies terminées entre l'entrée et la sortie (fenêtre historique)
+                starts = np.searchsorted(bar_ends, entry_ns, side='left')
+                stops = np.searchsorted(bar_ends, exit_ns, side='right')
+            elif edge_policy == 'include':
+                # Toutes les bougies qui chevauchent le trade
+                starts = np.searchsorted(bar_ends, entry_ns, side='left')
+                stops = np.searchsorted(bar_ends, exit_ns + bar_ns, side='left')
+            else:
+                # Seulement les bougies entièrement comprises dans le trade
+                starts = np.searchsorted(bar_ends, entry_ns + bar_ns, side='left')
+                stops = np.searchsorted(bar_ends, exit_ns, side='right')
+            windows.append((bar_ends, lows, highs, starts, stops))
             
-            return df, 'tick'
+            if edge_policy == 'interpolate':
+                # Les portions de bougies en bordure sont lues dans les ticks :
+                # [entrée, première frontière de bougie] et ]dernière frontière, sortie]
+                tick_times = timestamps_to_ns(tick_data_df['Timestamp'])
+                tick_prices = tick_data_df['Trade Price'].to_numpy(dtype='f8')
+                first_boundary = -(-entry_ns // bar_ns) * bar_ns
+                last_boundary = np.maximum(exit_ns // bar_ns * bar_ns, first_boundary)
+                windows.append((tick_times, tick_prices, tick_prices,
+                                np.searchsorted(tick_times, entry_ns, side='left'),
+                                np.searchsorted(tick_times, np.minimum(first_boundary, exit_ns), side='right')))
+                windows.append((tick_times, tick_prices, tick_prices,
+                                np.searchsorted(tick_times, last_boundary, side='right'),
+                                np.searchsorted(tick_times, exit_ns, side='right')))
         
-        else:
-            print(f"❌ ERREUR : Format de fichier non reconnu!")
-            print(f"   Colonnes détectées : {columns[:5]}...")
-            raise ValueError("Format de données de marché non supporté")
+        # Garder, pour chaque trade, le prix extrême (et son heure) sur toutes les fenêtres
+        extreme_prices = np.full(trade_count, np.nan)
+        extreme_times = np.full(trade_count, np.iinfo('i8').min)  # NaT
+        
+        for times, lows, highs, starts, stops in windows:
+            if len(times) == 0:
+                continue
+            
+            # LONG : plus bas des Low ; SHORT : plus haut des High
+            for direction_mask, values, find_max in ((is_long, lows, False), (~is_long, highs, True)):
+                trade_indices = np.flatnonzero(direction_mask)
+                prices, positions = segment_extremes(values, starts[trade_indices], stops[trade_indices], find_max)
+                candidate_times = times[np.maximum(positions, 0)]
+                current_prices = extreme_prices[trade_indices]
+                
+                if find_max:
+                    beats = prices > current_prices
+                else:
+                    beats = prices < current_prices
+                # À prix égal, on garde la première occurrence dans le temps
+                ties = (prices == current_prices) & (candidate_times < extreme_times[trade_indices])
+                better = ~np.isnan(prices) & (np.isnan(current_prices) | beats | ties)
+                
+                extreme_prices[trade_indices[better]] = prices[better]
+                extreme_times[trade_indices[better]] = candidate_times[better]
+        
+        # Drawdown en points : entrée - plus bas (LONG) ou plus haut - entrée (SHORT)
+        drawdown_points = np.where(is_long, entry_prices - extreme_prices, extreme_prices - entry_prices)
+        
+        return {
+            'max_drawdown_points': drawdown_points,
+            # 1 point NQ = $20
+            'max_drawdown_dollars': drawdown_points * 20 * quantities,
+            'max_drawdown_percent': (drawdown_points / entry_prices) * 100,
+            'lowest_price': extreme_prices,
+            'lowest_price_time': pd.to_datetime(extreme_times.view('datetime64[ns]'))
+        }
     
-    def calculate_drawdown(self, trade, market_data_df, data_format):
+    def drawdown_stats(self, columns, index):
         """
-        Calcule le drawdown maximum pour un trade donné
+        Extrait les statistiques d'un trade depuis les colonnes du moteur de drawdown
         
         Args:
-            trade (dict): Informations du trade
-            market_data_df (DataFrame): Données de marché
-            data_format (str): 'tick' ou 'ohlc'
+            columns (dict): Colonnes renvoyées par calculate_all_drawdowns
+            index (int): Position du trade dans ces colonnes
             
         Returns:
-            dict: Statistiques du drawdown
+            dict: Statistiques du drawdown (None si aucune donnée de marché)
         """
-        # Filtrer les données de marché pour la période du trade
-        mask = (market_data_df['Timestamp'] >= trade['entry_time']) & \
-               (market_data_df['Timestamp'] <= trade['exit_time'])
+        import pandas as pd
         
-        trade_data = market_data_df[mask].copy()
-        
-        if len(trade_data) == 0:
-            print(f"⚠️  Aucune donnée de marché trouvée pour le trade {trade['trade_number']}")
+        if pd.isna(columns['max_drawdown_points'][index]):
             return {
                 'max_drawdown_points': None,
                 'max_drawdown_dollars': None,
@@ -212,57 +674,202 @@ class NQDrawdownCalculator:
                 'lowest_price_time': None
             }
         
-        # Calculer le drawdown selon le format et la direction du trade
-        if trade['direction'] == 'LONG':
-            # Pour un trade long, le drawdown est la différence entre le prix d'entrée et le plus bas
+        return {
+            'max_drawdown_points': float(columns['max_drawdown_points'][index]),
+            'max_drawdown_dollars': float(columns['max_drawdown_dollars'][index]),
+            'max_drawdown_percent': float(columns['max_drawdown_percent'][index]),
+            'lowest_price': float(columns['lowest_price'][index]),
+            'lowest_price_time': columns['lowest_price_time'][index]
+        }
+    
+    def calculate_drawdown(self, trade, market_data_df, data_format, tick_data_df=None):
+        """
+        Calcule le drawdown maximum pour un trade donné
+        
+        Args:
+            trade (dict): Informations du trade
+            market_data_df (DataFrame): Données de marché
+            data_format (str): 'tick' ou 'ohlc'
+            tick_data_df (DataFrame): Ticks pour interpoler les bougies en bordure (optionnel)
             
-            if data_format == 'ohlc':
-                # Format OHLC : on prend le Low de toutes les bougies
-                lowest_price = trade_data['Low'].min()
-                lowest_price_time = trade_data[trade_data['Low'] == lowest_price]['Timestamp'].iloc[0]
-            else:
-                # Format tick : on prend le prix le plus bas
-                lowest_price = trade_data['Trade Price'].min()
-                lowest_price_time = trade_data[trade_data['Trade Price'] == lowest_price]['Timestamp'].iloc[0]
+        Returns:
+            dict: Statistiques du drawdown
+        """
+        import pandas as pd
+        
+        trades = {column: [trade[column]] for column in ('entry_time', 'exit_time', 'entry_price', 'quantity', 'direction')}
+        trades['entry_time'] = pd.to_datetime(trades['entry_time'])
+        trades['exit_time'] = pd.to_datetime(trades['exit_time'])
+        columns = self.calculate_all_drawdowns(trades, market_data_df, data_format, tick_data_df)
+        return self.drawdown_stats(columns, 0)
+    
+    def read_cache_file(self):
+        """
+        Lit le cache des drawdowns sur le disque (JSON, jamais de code exécuté à la lecture)
+        Un cache illisible ou d'une autre version du moteur est simplement ignoré et sera reconstruit
+        
+        Returns:
+            dict: Entrées de la version courante du moteur (vide si pas de cache)
+        """
+        import pandas as pd
+        
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                cache = json.load(f)
             
-            # Drawdown en points
-            drawdown_points = trade['entry_price'] - lowest_price
+            # Les entrées d'une autre version du moteur ne sont plus valables
+            if cache.get('version') != CACHE_VERSION:
+                return {}
             
-        else:  # SHORT
-            # Pour un trade short, le drawdown est la différence entre le plus haut et le prix d'entrée
+            entries = {}
+            for trade_key, fingerprint, stats in cache['entries']:
+                if stats['lowest_price_time'] is not None:
+                    stats['lowest_price_time'] = pd.Timestamp(stats['lowest_price_time'])
+                entries[(CACHE_VERSION, tuple(trade_key), fingerprint)] = stats
+            return entries
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            print(f"⚠️  Cache illisible, il sera reconstruit : {self.cache_file}")
+            return {}
+    
+    def load_cache(self):
+        """
+        Charge le cache des drawdowns depuis le disque (s'il existe)
+        """
+        self.cache = self.read_cache_file()
+        return self.cache
+    
+    def save_cache(self, used_keys=()):
+        """
+        Sauvegarde le cache des drawdowns sur le disque (écriture atomique, sous verrou)
+        Le cache est fusionné avec celui du disque juste avant l'écriture, pour garder
+        les entrées ajoutées entre-temps par un autre calcul
+        
+        Args:
+            used_keys (iterable): Clés utilisées par ce calcul (gardées en priorité)
+        """
+        if not self.cache_file:
+            return
+        
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        
+        # Le verrou empêche deux calculs de fusionner la même version du cache en même temps
+        with report_lock(self.cache_file):
+            cache = self.read_cache_file()
+            for key, value in self.cache.items():
+                cache.setdefault(key, value)
             
-            if data_format == 'ohlc':
-                # Format OHLC : on prend le High de toutes les bougies
-                highest_price = trade_data['High'].max()
-                lowest_price_time = trade_data[trade_data['High'] == highest_price]['Timestamp'].iloc[0]
-                lowest_price = highest_price
-            else:
-                # Format tick : on prend le prix le plus haut
-                highest_price = trade_data['Trade Price'].max()
-                lowest_price_time = trade_data[trade_data['Trade Price'] == highest_price]['Timestamp'].iloc[0]
-                lowest_price = highest_price
+            # Les entrées utilisées passent en fin de cache (les plus récentes)
+            for key in used_keys:
+                cache.pop(key, None)
+                cache[key] = self.cache[key]
+            
+            # Limiter la taille du cache en retirant les entrées les plus anciennes
+            if len(cache) > CACHE_MAX_ENTRIES:
+                cache = dict(list(cache.items())[-CACHE_MAX_ENTRIES:])
+            
+            # Heures au format ISO : le JSON ne connaît pas les dates
+            entries = []
+            for (version, trade_key, fingerprint), stats in cache.items():
+                stats = dict(stats)
+                if stats['lowest_price_time'] is not None:
+                    stats['lowest_price_time'] = stats['lowest_price_time'].isoformat()
+                entries.append([list(trade_key), fingerprint, stats])
             
-            # Drawdown en points (négatif car c'est un short)
-            drawdown_points = highest_price - trade['entry_price']
+            def write_cache(temp_path):
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': CACHE_VERSION, 'entries': entries}, f)
+            
+            atomic_write(self.cache_file, write_cache)
         
-        # Calculer le drawdown en dollars (1 point NQ = $20)
-        drawdown_dollars = drawdown_points * 20 * trade['quantity']
+        self.cache = cache
+    
+    def trade_keys(self, trades):
+        """
+        Construit l'identité de chaque trade (indépendante de son numéro dans la session)
         
-        # Calculer le drawdown en pourcentage du prix d'entrée
-        drawdown_percent = (drawdown_points / trade['entry_price']) * 100
+        Args:
+            trades (dict): Colonnes des trades
+            
+        Returns:
+            list: Par trade, heures (ns) et prix d'entrée/sortie, quantité et direction
+        """
+        return list(zip(
+            timestamps_to_ns(trades['entry_time']).tolist(),
+            timestamps_to_ns(trades['exit_time']).tolist(),
+            [float(price) for price in trades['entry_price']],
+            [float(price) for price in trades['exit_price']],
+            [int(quantity) for quantity in trades['quantity']],
+            list(trades['direction'])
+        ))
+    
+    def market_data_fingerprints(self, trades, market_data_df, data_format, tick_data_df=None):
+        """
+        Calcule, pour chaque trade, l'empreinte des données de marché couvrant sa fenêtre
+        Si les données de la fenêtre changent (nouvel export, données corrigées),
+        l'empreinte change et le drawdown est recalculé
         
-        return {
-            'max_drawdown_points': drawdown_points,
-            'max_drawdown_dollars': drawdown_dollars,
-            'max_drawdown_percent': drawdown_percent,
-            'lowest_price': lowest_price,
-            'lowest_price_time': lowest_price_time
-        }
+        Chaque ligne (heure et prix) est hachée une seule fois, puis les empreintes sont
+        cumulées : celle d'une fenêtre est la différence de deux sommes cumulées, le coût
+        ne dépend donc que du nombre de lignes et de trades, pas de la longueur des fenêtres
+        
+        Args:
+            trades (dict): Colonnes des trades
+            market_data_df (DataFrame): Données de marché (triées par Timestamp)
+            data_format (str): 'tick' ou 'ohlc'
+            tick_data_df (DataFrame): Ticks utilisés pour les bougies en bordure (optionnel)
+            
+        Returns:
+            list: Empreinte (réglages du calcul, nombre de lignes et hachage 128 bits) par trade
+        """
+        import numpy as np
+        
+        entry_ns = timestamps_to_ns(trades['entry_time'])
+        exit_ns = timestamps_to_ns(trades['exit_time'])
+        settings = f"{data_format}|{self.edge_policy}|{self.bar_seconds}"
+        
+        if data_format == 'ohlc':
+            # Marge d'une bougie de chaque côté pour couvrir les bougies en bordure
+            margin = self.bar_seconds * 1_000_000_000
+            sources = [(market_data_df, ['Low', 'High'], margin)]
+            if tick_data_df is not None and self.edge_policy == 'interpolate':
+                sources.append((tick_data_df, ['Trade Price'], 0))
+        else:
+            sources = [(market_data_df, ['Trade Price'], 0)]
+        
+        parts = [[settings] * len(entry_ns)]
+        for df, price_columns, margin in sources:
+            timestamps = timestamps_to_ns(df['Timestamp'])
+            prices = [df[column].to_numpy(dtype='f8').view('u8') for column in price_columns]
+            starts = np.searchsorted(timestamps, entry_ns - margin, side='left')
+            stops = np.searchsorted(timestamps, exit_ns + margin, side='right')
+            
+            # Deux hachages 64 bits indépendants par ligne, cumulés (modulo 2^64)
+            window_hashes = []
+            for seed in (0, 1):
+                row_hashes = mix_hash(timestamps.view('u8') + np.uint64(seed))
+                for price_values in prices:
+                    row_hashes = mix_hash(row_hashes ^ price_values)
+                cumulated = np.r_[np.zeros(1, dtype='u8'), np.cumsum(row_hashes, dtype='u8')]
+                window_hashes.append(cumulated[stops] - cumulated[starts])
+            
+            parts.append([f"{count}:{low:016x}{high:016x}" for count, low, high
+                          in zip((stops - starts).tolist(), window_hashes[0].tolist(), window_hashes[1].tolist())])
+        
+        return ['|'.join(trade_parts) for trade_parts in zip(*parts)]
     
     def process_all_trades(self):
         """
         Traite tous les trades et calcule les drawdowns
+        Les résultats sont rangés en colonnes dans self.results
         """
+        import numpy as np
+        import pandas as pd
+        
         print("\n" + "="*60)
         print("🚀 DÉBUT DU CALCUL DES DRAWDOWNS")
         print("="*60 + "\n")
@@ -272,46 +879,105 @@ class NQDrawdownCalculator:
         
         # Identifier les trades
         self.trades = self.identify_trades(orders_df)
+        trade_count = len(self.trades['trade_number'])
         
         # Charger les données de marché
         market_data_df, data_format = self.load_market_data()
+        market_data_df, data_format, tick_data_df = self.prepare_market_data(market_data_df, data_format)
         
-        # Calculer le drawdown pour chaque trade
-        print(f"\n💹 Calcul des drawdowns pour {len(self.trades)} trades...")
+        # Charger les drawdowns déjà calculés lors des exécutions précédentes
+        self.load_cache()
+        self.cache_hits = 0
+        self.cache_misses = 0
         
-        for i, trade in enumerate(self.trades, 1):
-            print(f"\n📈 Trade {i}/{len(self.trades)}:")
-            print(f"   Direction: {trade['direction']}")
-            print(f"   Entrée: {trade['entry_price']} @ {trade['entry_time']}")
-            print(f"   Sortie: {trade['exit_price']} @ {trade['exit_time']}")
-            print(f"   P&L: {trade['profit_loss']:.2f} points")
-            
-            # Calculer le drawdown
-            dd_stats = self.calculate_drawdown(trade, market_data_df, data_format)
-            
-            # Ajouter les stats au trade
-            trade.update(dd_stats)
+        # Seuls les trades absents du cache (nouveaux ou modifiés) passent par le moteur
+        cache_keys = list(zip(
+            [CACHE_VERSION] * trade_count,
+            self.trade_keys(self.trades),
+            self.market_data_fingerprints(self.trades, market_data_df, data_format, tick_data_df)
+        ))
+        to_compute = [j for j, cache_key in enumerate(cache_keys) if cache_key not in self.cache]
+        
+        # Colonnes de drawdown de tous les trades (NaN/NaT si aucune donnée)
+        drawdowns = {column: np.full(trade_count, np.nan) for column in DRAWDOWN_COLUMNS}
+        drawdowns['lowest_price_time'] = np.full(trade_count, np.datetime64('NaT'), dtype='datetime64[ns]')
+        
+        # Calculer les drawdowns manquants en une seule passe
+        print(f"\n💹 Calcul des drawdowns pour {len(to_compute)}/{trade_count} trades...")
+        
+        if to_compute:
+            trades_to_compute = {column: values[to_compute] for column, values in self.trades.items()}
+            columns = self.calculate_all_drawdowns(trades_to_compute, market_data_df, data_format, tick_data_df)
+            for column in DRAWDOWN_COLUMNS:
+                drawdowns[column][to_compute] = np.asarray(columns[column])
+            for position, j in enumerate(to_compute):
+                self.cache[cache_keys[j]] = self.drawdown_stats(columns, position)
+        
+        computed = set(to_compute)
+        
+        for j, cache_key in enumerate(cache_keys):
+            print(f"\n📈 Trade {j + 1}/{trade_count}:")
+            print(f"   Direction: {self.trades['direction'][j]}")
+            print(f"   Entrée: {self.trades['entry_price'][j]} @ {pd.Timestamp(self.trades['entry_time'][j])}")
+            print(f"   Sortie: {self.trades['exit_price'][j]} @ {pd.Timestamp(self.trades['exit_time'][j])}")
+            print(f"   P&L: {self.trades['profit_loss'][j]:.2f} points")
             
-            if dd_stats['max_drawdown_points'] is not None:
-                print(f"   ⬇️  Drawdown Max: {dd_stats['max_drawdown_points']:.2f} points")
-                print(f"   💰 Drawdown $: ${dd_stats['max_drawdown_dollars']:.2f}")
-                print(f"   📊 Drawdown %: {dd_stats['max_drawdown_percent']:.3f}%")
-                print(f"   🎯 Prix extrême: {dd_stats['lowest_price']} @ {dd_stats['lowest_price_time']}")
+            # Réutiliser le drawdown en cache si le trade et ses données n'ont pas changé
+            if j in computed:
+                self.cache_misses += 1
+            else:
+                for column, value in self.cache[cache_key].items():
+                    drawdowns[column][j] = value
+                self.cache_hits += 1
+                print("   ♻️  Drawdown récupéré du cache")
             
-            self.results.append(trade)
+            if np.isnan(drawdowns['max_drawdown_points'][j]):
+                print(f"⚠️  Aucune donnée de marché trouvée pour le trade {self.trades['trade_number'][j]}")
+            else:
+                print(f"   ⬇️  Drawdown Max: {drawdowns['max_drawdown_points'][j]:.2f} points")
+                print(f"   💰 Drawdown $: ${drawdowns['max_drawdown_dollars'][j]:.2f}")
+                print(f"   📊 Drawdown %: {drawdowns['max_drawdown_percent'][j]:.3f}%")
+                print(f"   🎯 Prix extrême: {drawdowns['lowest_price'][j]} @ {pd.Timestamp(drawdowns['lowest_price_time'][j])}")
+        
+        # Résultats en colonnes : identité des trades puis drawdowns
+        self.results = {column: self.trades[column] for column in TRADE_COLUMNS}
+        self.results.update(drawdowns)
+        
+        # Sauvegarder le cache pour la prochaine exécution
+        # (rien de nouveau : le cache sur le disque contient déjà tous ces trades)
+        if to_compute:
+            self.save_cache(cache_keys)
         
         print("\n" + "="*60)
         print("✅ CALCUL TERMINÉ")
-        print("="*60 + "\n")
+        print("="*60)
+        print(f"♻️  Cache : {self.cache_hits} trade(s) réutilisé(s), {self.cache_misses} calculé(s) "
+              f"(taux de réussite : {self.cache_hit_rate():.1f}%)\n")
     
-    def save_results(self, output_file=None):
+    def cache_hit_rate(self):
+        """
+        Retourne le taux de réussite du cache pour la dernière exécution
+        
+        Returns:
+            float: Pourcentage de trades servis depuis le cache
         """
-        Sauvegarde les résultats dans un fichier CSV dans le dossier Rapports
+        total = self.cache_hits + self.cache_misses
+        if total == 0:
+            return 0.0
+        return (self.cache_hits / total) * 100
+    
+    def save_results(self, output_file=None, fmt='csv', report_tag=None):
+        """
+        Sauvegarde les résultats dans le dossier Rapports (CSV, Parquet ou Feather)
         Le fichier est automatiquement nommé avec la date si non spécifié
         
         Args:
-            output_file (str): Nom du fichier de sortie (optionnel)
+            output_file (str): Nom du fichier de sortie (optionnel, son extension fixe le format)
+            fmt (str): Format du nom automatique : 'csv', 'parquet' ou 'feather'
+            report_tag (str): Ajouté au nom automatique, après la date (optionnel)
         """
+        import pandas as pd
+        
         # Créer le dossier Rapports s'il n'existe pas
         reports_dir = 'Rapports'
         if not os.path.exists(reports_dir):
@@ -319,25 +985,25 @@ class NQDrawdownCalculator:
             print(f"📁 Dossier '{reports_dir}' créé")
         
         # Si pas de nom de fichier spécifié, utiliser la date des trades
-        if output_file is None and len(self.results) > 0:
+        extension = REPORT_FORMATS[fmt]
+        if report_tag:
+            extension = f"_{report_tag}{extension}"
+        if output_file is None and len(self.results.get('entry_time', [])) > 0:
             # Prendre la date du premier trade
-            first_trade_date = self.results[0]['entry_time'].strftime('%Y-%m-%d')
-            output_file = f"rapport_drawdown_{first_trade_date}.csv"
+            first_trade_date = pd.Timestamp(self.results['entry_time'][0]).strftime('%Y-%m-%d')
+            output_file = f"rapport_drawdown_{first_trade_date}{extension}"
         elif output_file is None:
             # Fallback : date du jour
             from datetime import datetime
-            output_file = f"rapport_drawdown_{datetime.now().strftime('%Y-%m-%d')}.csv"
+            output_file = f"rapport_drawdown_{datetime.now().strftime('%Y-%m-%d')}{extension}"
         
         # Construire le chemin complet
         output_path = os.path.join(reports_dir, output_file)
         
         print(f"💾 Sauvegarde des résultats dans {output_path}...")
         
-        # Convertir les résultats en DataFrame
-        results_df = pd.DataFrame(self.results)
-        
-        # Sauvegarder en CSV
-        results_df.to_csv(output_path, index=False)
+        # Écrire directement les colonnes (écriture atomique)
+        results_df = write_report(self.results, output_path)
         
         print(f"✅ Résultats sauvegardés avec succès!")
         print(f"📂 Emplacement : {os.path.abspath(output_path)}")
@@ -348,26 +1014,30 @@ class NQDrawdownCalculator:
         """
         Génère un résumé statistique des drawdowns
         """
-        if not self.results:
+        import numpy as np
+        
+        if len(self.results.get('max_drawdown_points', [])) == 0:
             print("⚠️  Aucun résultat à analyser")
             return
         
         # Filtrer les trades avec drawdown calculé
-        valid_trades = [t for t in self.results if t['max_drawdown_points'] is not None]
+        valid_trades = ~np.isnan(self.results['max_drawdown_points'])
         
-        if not valid_trades:
+        if not valid_trades.any():
             print("⚠️  Aucun drawdown calculé")
             return
         
         # Calculer les statistiques
-        dd_points = [t['max_drawdown_points'] for t in valid_trades]
-        dd_dollars = [t['max_drawdown_dollars'] for t in valid_trades]
-        dd_percent = [t['max_drawdown_percent'] for t in valid_trades]
+        dd_points = self.results['max_drawdown_points'][valid_trades]
+        dd_dollars = self.results['max_drawdown_dollars'][valid_trades]
+        dd_percent = self.results['max_drawdown_percent'][valid_trades]
         
         print("\n" + "="*60)
         print("📊 RÉSUMÉ STATISTIQUE DES DRAWDOWNS")
         print("="*60)
-        print(f"\n📌 Nombre total de trades analysés: {len(valid_trades)}")
+        print(f"\n📌 Nombre total de trades analysés: {valid_trades.sum()}")
+        print(f"♻️  Taux de réussite du cache: {self.cache_hit_rate():.1f}% "
+              f"({self.cache_hits}/{self.cache_hits + self.cache_misses} trades)")
         print(f"\n🎯 DRAWDOWN EN POINTS:")
         print(f"   Moyen: {np.mean(dd_points):.2f} points")
         print(f"   Médian: {np.median(dd_points):.2f} points")
@@ -390,9 +1060,222 @@ class NQDrawdownCalculator:
         print("\n" + "="*60 + "\n")
 
 
-def main():
+def run_calculation(orders_file, market_data_file, output_file=None, cache_file=None,
+                    edge_policy='legacy', resolution=None, tick_data_file=None, fmt='csv',
+                    report_tag=None):
+    """
+    Enchaîne le calcul complet pour une paire de fichiers : drawdowns, rapport et résumé
+    
+    Args:
+        orders_file (str): Chemin vers le fichier CSV des ordres
+        market_data_file (str): Chemin vers le fichier CSV des données de marché
+        output_file (str): Nom du fichier de sortie (optionnel)
+        cache_file (str): Chemin du cache des drawdowns (optionnel, False pour désactiver)
+        edge_policy (str): Traitement des bougies en bordure (voir EDGE_POLICIES)
+        resolution (str): Résolution des bougies construites à la volée (optionnel)
+        tick_data_file (str): Fichier tick-by-tick pour les bougies en bordure (optionnel)
+        fmt (str): Format du rapport : 'csv', 'parquet' ou 'feather'
+        report_tag (str): Ajouté au nom automatique du rapport, après la date (optionnel)
+        
+    Returns:
+        NQDrawdownCalculator: Le calculateur avec ses résultats
+    """
+    # Créer le calculateur
+    calculator = NQDrawdownCalculator(orders_file, market_data_file, cache_file=cache_file,
+                                      edge_policy=edge_policy, resolution=resolution,
+                                      tick_data_file=tick_data_file)
+    
+    # Traiter tous les trades
+    calculator.process_all_trades()
+    
+    # Sauvegarder les résultats
+    calculator.save_results(output_file, fmt, report_tag)
+    
+    # Générer le résumé
+    calculator.generate_summary()
+    
+    return calculator
+
+
+def validate_files(file_paths, kind='auto'):
+    """
+    Vérifie le format de fichiers CSV en lisant uniquement leur en-tête
+    
+    Args:
+        file_paths (list): Chemins des fichiers à vérifier
+        kind (str): 'orders', 'market' ou 'auto' (détection automatique)
+        
+    Returns:
+        bool: True si tous les fichiers sont valides
+    """
+    all_valid = True
+    
+    for file_path in file_paths:
+        name = os.path.basename(file_path)
+        
+        if not os.path.exists(file_path):
+            print(f"❌ {name} : fichier introuvable")
+            all_valid = False
+            continue
+        
+        errors = []
+        
+        if kind in ('orders', 'auto'):
+            try:
+                sniff_orders_file(file_path)
+                print(f"✅ {name} : fichier des ordres")
+                continue
+            except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+                errors.append(str(e))
+        
+        if kind in ('market', 'auto'):
+            try:
+                data_format = sniff_market_data_format(file_path)
+                print(f"✅ {name} : données de marché ({data_format})")
+                continue
+            except (OSError, ValueError, UnicodeDecodeError, csv.Error) as e:
+                errors.append(str(e))
+        
+        # Une même erreur (dossier, droits...) n'est affichée qu'une fois
+        print(f"❌ {name} : {' / '.join(dict.fromkeys(errors))}")
+        all_valid = False
+    
+    return all_valid
+
+
+def build_parser():
+    """
+    Construit le parseur de la ligne de commande
+    
+    Returns:
+        ArgumentParser: Parseur avec les sous-commandes calc, batch et validate
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculateur de drawdown maximum pour les trades NQ. "
+                    "Sans sous-commande, lance le mode interactif."
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    
+    common_options = argparse.ArgumentParser(add_help=False)
+    common_options.add_argument('--cache-file', default=None,
+                                help="Chemin du cache des drawdowns (défaut : Rapports/.cache_drawdowns.json)")
+    common_options.add_argument('--no-cache', action='store_true',
+                                help="Désactive le cache des drawdowns")
+    common_options.add_argument('--edge', choices=EDGE_POLICIES, default='legacy',
+                                help="Bougies à cheval sur l'entrée/la sortie : comportement historique, "
+                                     "incluses, exclues ou interpolées avec les ticks (défaut : legacy)")
+    common_options.add_argument('--resolution', default=None,
+                                help="Construit des bougies à cette résolution (ex : 5s, 1m)")
+    common_options.add_argument('--format', choices=list(REPORT_FORMATS), default='csv',
+                                help="Format du rapport (défaut : csv ; parquet/feather nécessitent pyarrow)")
+    
+    calc_parser = subparsers.add_parser('calc', parents=[common_options],
+                                        help="Calcule les drawdowns d'un fichier d'ordres")
+    calc_parser.add_argument('orders_file', help="Fichier CSV des ordres exécutés")
+    calc_parser.add_argument('market_data_file', help="Fichier CSV des données de marché NQ")
+    calc_parser.add_argument('-o', '--output', default=None,
+                             help="Nom du fichier de sortie (défaut : rapport_drawdown_YYYY-MM-DD.csv)")
+    calc_parser.add_argument('--ticks', default=None,
+                             help="Fichier tick-by-tick utilisé par --edge interpolate avec des bougies")
+    
+    batch_parser = subparsers.add_parser('batch', parents=[common_options],
+                                         help="Calcule les drawdowns de plusieurs paires de fichiers")
+    batch_parser.add_argument('--pair', nargs=2, action='append', required=True,
+                              metavar=('ORDRES', 'MARCHE'),
+                              help="Fichier des ordres et fichier de marché (répétable)")
+    
+    validate_parser = subparsers.add_parser('validate',
+                                            help="Vérifie le format des fichiers (en-têtes uniquement)")
+    validate_parser.add_argument('files', nargs='+', help="Fichiers CSV à vérifier")
+    validate_parser.add_argument('--kind', choices=['auto', 'orders', 'market'], default='auto',
+                                 help="Type de fichier attendu (défaut : auto)")
+    
+    return parser
+
+
+def main(argv=None):
+    """
+    Point d'entrée de la ligne de commande
+    
+    Args:
+        argv (list): Arguments (défaut : sys.argv[1:])
+        
+    Returns:
+        int: Code de sortie (0 si succès)
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.command is None:
+        interactive_main()
+        return 0
+    
+    if args.command == 'validate':
+        return 0 if validate_files(args.files, args.kind) else 1
+    
+    cache_file = False if args.no_cache else args.cache_file
+    
+    if args.resolution:
+        try:
+            parse_resolution(args.resolution)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.command == 'calc':
+        pairs = [(args.orders_file, args.market_data_file)]
+    else:
+        pairs = args.pair
+        
+        # En batch, chaque rapport porte le nom de son fichier d'ordres :
+        # deux sessions du même jour (deux comptes...) ne s'écrasent pas
+        stems = [os.path.splitext(os.path.basename(orders_file))[0] for orders_file, _ in pairs]
+        duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+        if duplicates:
+            parser.error(f"plusieurs paires produiraient le même rapport (fichiers d'ordres : {duplicates})")
+    
+    tick_data_file = getattr(args, 'ticks', None)
+    
+    # Sans extension reconnue, le rapport prend celle du format demandé
+    output_file = getattr(args, 'output', None)
+    if output_file and not output_file.lower().endswith(tuple(REPORT_FORMATS.values())):
+        output_file += REPORT_FORMATS[args.format]
+    
+    # Vérifier tous les fichiers avant de lancer le moindre calcul
+    if tick_data_file and not validate_files([tick_data_file], 'market'):
+        return 1
+    for orders_file, market_data_file in pairs:
+        if not validate_files([orders_file], 'orders') or not validate_files([market_data_file], 'market'):
+            return 1
+    
+    engine_options = {
+        'cache_file': cache_file,
+        'edge_policy': args.edge,
+        'resolution': args.resolution,
+        'tick_data_file': tick_data_file,
+        'fmt': args.format
+    }
+    
+    failures = 0
+    for orders_file, market_data_file in pairs:
+        try:
+            if args.command == 'calc':
+                run_calculation(orders_file, market_data_file, output_file, **engine_options)
+            else:
+                report_tag = os.path.splitext(os.path.basename(orders_file))[0]
+                run_calculation(orders_file, market_data_file, report_tag=report_tag, **engine_options)
+        except Exception as e:
+            print(f"❌ ERREUR sur {os.path.basename(orders_file)} : {e}")
+            failures += 1
+    
+    if args.command == 'batch':
+        print(f"📦 Batch terminé : {len(pairs) - failures}/{len(pairs)} paire(s) traitée(s)")
+    
+    return 1 if failures else 0
+
+
+def interactive_main():
     """
-    Fonction principale
+    Mode interactif (drag & drop des fichiers dans le terminal)
     """
     print("="*60)
     print("   CALCULATEUR DE DRAWDOWN NQ")
@@ -445,7 +1328,7 @@ def main():
         output_file = None  # Utilisera le nom automatique avec la date
     else:
         # Ajouter l'extension .csv si oubliée
-        if not output_file.endswith('.csv'):
+        if not output_file.lower().endswith(tuple(REPORT_FORMATS.values())):
             output_file += '.csv'
         print(f"✅ Fichier de sortie personnalisé: {output_file}\n")
     
@@ -453,17 +1336,8 @@ def main():
     print("🚀 Lancement de l'analyse...")
     print("="*60 + "\n")
     
-    # Créer le calculateur
-    calculator = NQDrawdownCalculator(orders_file, market_data_file)
-    
-    # Traiter tous les trades
-    calculator.process_all_trades()
-    
-    # Sauvegarder les résultats
-    calculator.save_results(output_file)
-    
-    # Générer le résumé
-    calculator.generate_summary()
+    # Calculer, sauvegarder et résumer
+    run_calculation(orders_file, market_data_file, output_file)
     
     print("🎉 Processus terminé avec succès!")
     print(f"📁 Les résultats sont disponibles dans: {output_file}")
@@ -471,4 +1345,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
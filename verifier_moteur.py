@@ -0,0 +1,200 @@
+"""
+Vérification du moteur de drawdown vectorisé
+Compare, sur des données synthétiques, chaque traitement des bougies en bordure
+(et le mode tick-by-tick) à un parcours naïf des ticks, trade par trade
+
+Utilisation :
+    python verifier_moteur.py          (code de sortie 1 en cas d'écart)
+"""
+
+import sys
+
+import nq_drawdown_calculator
+from nq_drawdown_calculator import EDGE_POLICIES, NQDrawdownCalculator, resample_bars
+
+# Petit budget du moteur pour forcer le traitement par paquets et les segments longs
+SMALL_SEGMENT_BUDGET = 5_000
+
+
+def generate_ticks(rng, count=50_000, duration_seconds=3600):
+    """
+    Génère une séance de ticks NQ aléatoire (prix arrondis au quart de point
+    pour provoquer des égalités entre extrêmes)
+    
+    Args:
+        rng (Generator): Générateur aléatoire NumPy
+        count (int): Nombre de ticks
+        duration_seconds (int): Durée de la séance
+    
+    Returns:
+        DataFrame: Ticks avec les colonnes Timestamp et Trade Price
+    """
+    import numpy as np
+    import pandas as pd
+    
+    start_ns = pd.Timestamp('2026-01-12 15:30:00').value
+    # Heures à la milliseconde, donc parfois pile sur une frontière de bougie
+    offsets_ms = np.sort(rng.integers(0, duration_seconds * 1000, count))
+    timestamps = (start_ns + offsets_ms * 1_000_000).astype('datetime64[ns]')
+    prices = np.round((20000 + np.cumsum(rng.normal(0, 0.5, count))) * 4) / 4
+    
+    return pd.DataFrame({'Timestamp': timestamps, 'Trade Price': prices})
+
+
+def generate_trades(rng, ticks, count=300):
+    """
+    Génère des trades aléatoires (certains se chevauchent, certains tiennent
+    dans une seule bougie, certains sont alignés sur les frontières de bougies,
+    un sur dix est une position longue de 20 à 50 minutes)
+    
+    Args:
+        rng (Generator): Générateur aléatoire NumPy
+        ticks (DataFrame): Ticks de la séance
+        count (int): Nombre de trades
+    
+    Returns:
+        dict: Colonnes des trades
+    """
+    import numpy as np
+    
+    first_ns = ticks['Timestamp'].iloc[0].value
+    last_ns = ticks['Timestamp'].iloc[-1].value
+    entry_ns = rng.integers(first_ns - 10**10, last_ns, count)
+    entry_ns[::7] = entry_ns[::7] // 10**9 * 10**9
+    exit_ns = entry_ns + rng.integers(10**8, 120 * 10**9, count)
+    exit_ns[::10] = entry_ns[::10] + rng.integers(1200 * 10**9, 3000 * 10**9, len(exit_ns[::10]))
+    exit_ns[::5] = exit_ns[::5] // 10**9 * 10**9 + 10**9
+    
+    return {
+        'entry_time': entry_ns.astype('datetime64[ns]'),
+        'exit_time': exit_ns.astype('datetime64[ns]'),
+        'entry_price': np.full(count, 20000.0),
+        'quantity': rng.integers(1, 4, count),
+        'direction': np.where(rng.random(count) < 0.5, 'LONG', 'SHORT').astype(object)
+    }
+
+
+def brute_force_extreme(trade, tick_ns, tick_prices, edge_policy, bar_ns):
+    """
+    Prix extrême et heure affichée d'un trade, par parcours naïf des ticks
+    Un tick à t appartient à la bougie qui se termine à ceil(t / durée) * durée
+    
+    Args:
+        trade (tuple): (entrée ns, sortie ns, LONG ?)
+        tick_ns (ndarray): Heures des ticks (ns)
+        tick_prices (ndarray): Prix des ticks
+        edge_policy (str): Traitement des bougies en bordure, ou 'tick'
+        bar_ns (int): Durée des bougies (ns)
+    
+    Returns:
+        tuple: (prix extrême, heure ns) ou (None, None) sans données
+    """
+    import numpy as np
+    
+    entry_ns, exit_ns, is_long = trade
+    bar_ends = -(-tick_ns // bar_ns) * bar_ns
+    inside = (tick_ns >= entry_ns) & (tick_ns <= exit_ns)
+    full_bar = (bar_ends - bar_ns >= entry_ns) & (bar_ends <= exit_ns)
+    
+    if edge_policy == 'tick':
+        selected, shown_ns = inside, tick_ns
+    elif edge_policy == 'legacy':
+        selected, shown_ns = (bar_ends >= entry_ns) & (bar_ends <= exit_ns), bar_ends
+    elif edge_policy == 'include':
+        selected, shown_ns = (bar_ends >= entry_ns) & (bar_ends < exit_ns + bar_ns), bar_ends
+    elif edge_policy == 'exclude':
+        selected, shown_ns = full_bar, bar_ends
+    else:
+        # interpolate : bougies entières datées de leur fin, ticks de bordure à leur heure
+        selected, shown_ns = inside, np.where(full_bar, bar_ends, tick_ns)
+    
+    if not selected.any():
+        return None, None
+    
+    prices = tick_prices[selected]
+    extreme = prices.min() if is_long else prices.max()
+    return extreme, shown_ns[selected][prices == extreme].min()
+
+
+def check(label, columns, trades, tick_ns, tick_prices, edge_policy, bar_ns):
+    """
+    Compare les colonnes du moteur au parcours naïf et affiche le résultat
+    
+    Returns:
+        int: Nombre de trades en écart
+    """
+    import numpy as np
+    
+    from nq_drawdown_calculator import timestamps_to_ns
+    
+    entry_ns = timestamps_to_ns(trades['entry_time'])
+    exit_ns = timestamps_to_ns(trades['exit_time'])
+    engine_times = timestamps_to_ns(columns['lowest_price_time'])
+    mismatches = 0
+    
+    for j in range(len(entry_ns)):
+        trade = (entry_ns[j], exit_ns[j], trades['direction'][j] == 'LONG')
+        expected_price, expected_ns = brute_force_extreme(trade, tick_ns, tick_prices, edge_policy, bar_ns)
+        price = columns['lowest_price'][j]
+        
+        if expected_price is None:
+            ok = np.isnan(price)
+        else:
+            ok = price == expected_price and engine_times[j] == expected_ns
+        mismatches += not ok
+    
+    status = "✅" if mismatches == 0 else "❌"
+    print(f"{status} {label:<28} {len(entry_ns) - mismatches}/{len(entry_ns)} trades identiques")
+    return mismatches
+
+
+def main():
+    """
+    Lance toutes les vérifications
+    
+    Returns:
+        int: Code de sortie (0 si aucun écart)
+    """
+    import numpy as np
+    
+    from nq_drawdown_calculator import timestamps_to_ns
+    
+    rng = np.random.default_rng(2026)
+    ticks = generate_ticks(rng)
+    trades = generate_trades(rng, ticks)
+    tick_ns = timestamps_to_ns(ticks['Timestamp'])
+    tick_prices = ticks['Trade Price'].to_numpy()
+    
+    print("🔍 Vérification du moteur de drawdown (données synthétiques)\n")
+    mismatches = 0
+    
+    for budget in (nq_drawdown_calculator.SEGMENT_BUDGET, SMALL_SEGMENT_BUDGET):
+        nq_drawdown_calculator.SEGMENT_BUDGET = budget
+        print(f"📦 Budget du moteur : {budget:,} prix par paquet")
+        
+        # Mode tick-by-tick
+        calculator = NQDrawdownCalculator('', '', cache_file=False)
+        columns = calculator.calculate_all_drawdowns(trades, ticks, 'tick')
+        mismatches += check("tick", columns, trades, tick_ns, tick_prices, 'tick', 1)
+        
+        # Bougies 1s et 5s construites à partir des ticks, pour chaque traitement des bordures
+        for resolution, bar_seconds in (('1s', 1), ('5s', 5)):
+            bars = resample_bars(ticks, 'tick', bar_seconds)
+            for edge_policy in EDGE_POLICIES:
+                calculator = NQDrawdownCalculator('', '', cache_file=False,
+                                                  edge_policy=edge_policy, resolution=resolution)
+                columns = calculator.calculate_all_drawdowns(trades, bars, 'ohlc', ticks)
+                mismatches += check(f"{edge_policy} ({resolution})", columns, trades,
+                                    tick_ns, tick_prices, edge_policy, bar_seconds * 1_000_000_000)
+        print()
+    
+    if mismatches:
+        print(f"❌ {mismatches} écart(s) détecté(s)")
+        return 1
+    
+    print("🎉 Moteur conforme au parcours naïf des ticks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())